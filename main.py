@@ -3,127 +3,515 @@ from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QComboBox, QTextEdit, QFileDialog, QMessageBox, QSizePolicy
 )
-from PyQt6.QtCore import Qt, QMimeData, QThread, pyqtSignal, QObject, QTimer
-from PyQt6.QtGui import QPixmap, QImage
-from PIL import Image
-import requests
-import base64
+from PyQt6.QtCore import Qt, QBuffer, QIODevice, QRunnable, QThreadPool, pyqtSignal, QObject, QTimer
+from PyQt6.QtGui import QImage, QPixmap, QTextCursor
+from PIL import Image, ImageOps
+import httpx
+import orjson
+import hashlib
+import io
+import logging
+import queue
+import re
+import threading
 import time
 import os
+from collections import OrderedDict, deque
+from functools import partial
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    # SIMD base64 (Mula & Lemire's SSSE3/AVX2 codec), several times faster
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
 load_dotenv()
 
-class OCRWorker(QObject):
+
+class _ColorFormatter(logging.Formatter):
+    def format(self, record):
+        message = super().format(record)
+        if record.levelno >= logging.ERROR:
+            return f"\033[91m{message}\033[0m"  # Red for errors
+        return message
+
+
+# Records are queued by any thread and written to stdout by a listener
+# thread, so a slow terminal or pipe never stalls the GUI or the workers
+_log_handler = logging.StreamHandler(sys.stdout)
+_log_handler.setFormatter(_ColorFormatter("[%(asctime)s] %(message)s", "%H:%M:%S"))
+_log_queue = queue.Queue(-1)
+LOG_LISTENER = QueueListener(_log_queue, _log_handler)
+LOGGER = logging.getLogger("ocr")
+LOGGER.setLevel(logging.INFO)
+LOGGER.addHandler(QueueHandler(_log_queue))
+LOGGER.propagate = False
+
+# Long side the image is scaled down to before upload; plenty for vision OCR
+MAX_IMAGE_SIDE = 1568
+JPEG_QUALITY = 85
+
+# Pixmaps above this many pixels get a fast preview scale while resizing
+PREVIEW_PIXELS = 4_000_000
+
+PROMPT = (
+    "Extract ALL text from this image exactly as it appears. "
+    "Preserve original formatting, line breaks, punctuation and special characters. "
+    "Return ONLY the extracted text with NO additional commentary."
+)
+# Output is bounded by the text in the image; deterministic sampling also
+# keeps cached results reproducible
+MAX_TOKENS = 2048
+
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Vision models served by Groq, smallest first; anything else in the dropdown
+# goes to Ollama. Requests start at the first model and escalate up to the
+# selected one when the output looks empty or garbled.
+GROQ_MODELS = ["llama-3.2-11b-vision-preview", "llama-3.2-90b-vision-preview"]
+CACHE_DIR = Path.home() / ".cache" / "ollamapy-ocr"
+
+# Transient API failures are retried with exponential backoff (1s, 2s, 4s)
+RETRY_STATUSES = {429, 502, 503, 504}
+MAX_RETRIES = 3
+MAX_RETRY_WAIT = 30
+
+# Client-side cap on Groq requests (free tier allows 30 per minute for
+# vision), shared by every task so batches queue up instead of hitting 429
+GROQ_RPM = 30
+_RATE = deque(maxlen=GROQ_RPM)
+_RATE_LOCK = threading.Lock()
+
+# Shared across tasks so one HTTP/2 connection to the API is multiplexed
+# between runs. The transport only retries connection failures; HTTP
+# statuses are retried in OCRTask._post so the user can see the wait.
+CLIENT = httpx.Client(
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=MAX_RETRIES,
+        limits=httpx.Limits(max_keepalive_connections=8, max_connections=16),
+    ),
+    timeout=httpx.Timeout(120.0, connect=10.0),
+)
+
+
+def _encode_qimage(qimage):
+    """PNG-encode a QImage, e.g. a clipboard paste, for the upload pipeline."""
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    qimage.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+def _prepare_image(image_bytes):
+    """Downscale and re-encode an image as JPEG bytes ready for upload."""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        # Re-encoding drops EXIF, so apply its orientation now
+        img = ImageOps.exif_transpose(img)
+        # JPEG has no alpha; flatten onto white so dark text on a
+        # transparent background stays readable
+        if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+            img = img.convert("RGBA")
+            img = Image.alpha_composite(Image.new("RGBA", img.size, "white"), img)
+        img = img.convert("RGB")
+        img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+
+# Replacement characters or a short word, phrase or line looping many times.
+# The pattern must contain a letter or digit so dot leaders, form blanks and
+# ----/==== rules don't count
+GARBAGE_RE = re.compile(r"\ufffd|((?=.{0,15}[^\W_]).{1,16}?)\1{30,}", re.DOTALL)
+
+
+def _needs_escalation(text):
+    """Whether an OCR answer should be retried on a larger model."""
+    return not text or GARBAGE_RE.search(text) is not None
+
+
+def _is_transient(response):
+    """Whether a failed API response is worth retrying."""
+    if response.status_code == 200:
+        return False
+    if response.status_code in RETRY_STATUSES:
+        return True
+    body = response.text.lower()
+    return "rate limit" in body or "quota" in body
+
+
+def _raise_stream_error(provider, event):
+    """Raise the message of an error event sent mid-stream."""
+    error = event.get("error")
+    if error:
+        message = error.get("message", error) if isinstance(error, dict) else error
+        raise RuntimeError(f"API error ({provider}): {message}")
+
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before retrying, honouring Retry-After when present."""
+    try:
+        wait = float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        wait = 2 ** attempt
+    return min(wait, MAX_RETRY_WAIT)
+
+
+# How often OCRCache.set prunes expired files from disk
+SWEEP_INTERVAL = 3600
+
+
+class OCRCache:
+    """OCR results keyed by content hash: an in-process LRU backed by text files on disk."""
+
+    def __init__(self, directory=CACHE_DIR / "results", max_entries=128, ttl=7 * 24 * 3600):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    @staticmethod
+    def make_key(image_bytes, model, prompt):
+        digest = hashlib.sha256(image_bytes)
+        digest.update(model.encode())
+        digest.update(hashlib.sha256(prompt.encode()).digest())
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self.directory / f"{key}.txt"
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            text = path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+        self._remember(key, text)
+        return text
+
+    def set(self, key, text):
+        self._remember(key, text)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.directory / f"{key}.{threading.get_ident()}.tmp"
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, self.directory / f"{key}.txt")
+        except OSError:
+            pass  # The disk cache is best effort
+        if time.time() - self._last_sweep > SWEEP_INTERVAL:
+            self.sweep()
+
+    def sweep(self):
+        """Delete entries (and stray temp files) older than the TTL."""
+        self._last_sweep = now = time.time()
+        try:
+            paths = list(self.directory.iterdir())
+        except OSError:
+            return
+        for path in paths:
+            try:
+                if path.suffix in (".txt", ".tmp") and now - path.stat().st_mtime > self.ttl:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._memory[key] = text
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+
+CACHE = OCRCache()
+
+# Ollama's model list, reused on the next launch while a fresh probe runs
+TAGS_CACHE = CACHE_DIR / "tags.json"
+TAGS_TTL = 24 * 3600
+
+
+def _load_cached_models():
+    """Return the model names saved by the last successful probe, if still fresh."""
+    try:
+        if time.time() - TAGS_CACHE.stat().st_mtime > TAGS_TTL:
+            return None
+        return orjson.loads(TAGS_CACHE.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached_models(models):
+    try:
+        TAGS_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = TAGS_CACHE.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps(models))
+        os.replace(tmp_path, TAGS_CACHE)
+    except OSError:
+        pass  # The disk cache is best effort
+
+
+class ProbeSignals(QObject):
+    models_ready = pyqtSignal(list)
+    error = pyqtSignal(str)
+
+
+class ProbeTask(QRunnable):
+    """Fetch the model list from Ollama without blocking the GUI thread."""
+
+    def __init__(self, url):
+        super().__init__()
+        self.signals = ProbeSignals()
+        self.url = url
+
+    def run(self):
+        try:
+            response = CLIENT.get(f"{self.url}/api/tags", timeout=5)
+            if response.status_code == 200:
+                models = [model["name"] for model in orjson.loads(response.content).get("models", [])]
+                _save_cached_models(models)
+                self.signals.models_ready.emit(models)
+            else:
+                self.signals.error.emit(f"Connection failed: {response.text}")
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task once stop() has been called."""
+
+
+class WorkerSignals(QObject):
     finished = pyqtSignal()
     error = pyqtSignal(str)
     result = pyqtSignal(str)
+    delta = pyqtSignal(str)
+    restart = pyqtSignal()
     status = pyqtSignal(str)
-    log = pyqtSignal(str, bool)
 
-    def __init__(self, image_path, model, url):
+
+class OCRTask(QRunnable):
+    def __init__(self, image_path, model, url, image_data=None):
         super().__init__()
+        self.signals = WorkerSignals()
         self.image_path = image_path
+        # Raw file bytes, a pasted QImage, or None to read image_path
+        self.image_data = image_data
         self.model = model
         self.url = url
-        self._is_running = True
+        self._stopped = threading.Event()
 
     def run(self):
         try:
-            self.status.emit("Processing image...")
+            self.signals.status.emit("Processing image...")
             start_time = time.time()
             
-            with open(self.image_path, "rb") as image_file:
-                encoded_image = base64.b64encode(image_file.read()).decode("utf-8")
-            
-            self.log.emit(f"Image encoded in {time.time()-start_time:.2f}s", False)
-            
-            prompt = """Extract ALL text from this image exactly as it appears.
-            Preserve original formatting, line breaks, punctuation and special characters.
-            Return ONLY the extracted text with NO additional commentary."""
+            # Look the image up before doing any image work; reuse the
+            # bytes the window already read when it has them. Pasted images
+            # arrive as a QImage and are encoded here, off the GUI thread
+            raw = self.image_data
+            if isinstance(raw, QImage):
+                raw = _encode_qimage(raw)
+            elif raw is None:
+                raw = Path(self.image_path).read_bytes()
+            cache_key = OCRCache.make_key(raw, self.model, PROMPT)
+            cached = CACHE.get(cache_key)
+            if cached is not None:
+                elapsed = time.time() - start_time
+                self.signals.result.emit(cached)
+                self.signals.status.emit(f"Done in {elapsed:.2f}s (cached)")
+                LOGGER.info(f"Cache hit for {cache_key[:12]}")
+                return
             
-            data = {
-                "model": "llama-3.2-11b-vision-preview",
-                "prompt": prompt,
-                "images": [encoded_image],
-                "stream": False
-            }
+            # Shrink to a JPEG first; base64 output is pure ASCII
+            jpeg_bytes = _prepare_image(raw)
+            encoded_image = _b64.b64encode(memoryview(jpeg_bytes)).decode("ascii")
             
-            self.log.emit(f"Sending to {self.model}", False)
+            LOGGER.info(f"Image encoded in {time.time()-start_time:.2f}s ({len(jpeg_bytes) // 1024} KB)")
+            # Start on the smallest Groq model and only escalate towards the
+            # selected one when the answer looks unusable
+            if self.model in GROQ_MODELS:
+                tiers = GROQ_MODELS[:GROQ_MODELS.index(self.model) + 1]
+            else:
+                tiers = [self.model]
             
-            # Original Ollama API request (commented out):
-            # response = requests.post(
-            #     f"{self.url}/api/generate",
-            #     json=data,
-            #     headers={"Content-Type": "application/json"},
-            #     timeout=120
-            # )
-            # if response.status_code == 200:
-            #     result = response.json()
-            #     text = result.get("response", "").strip()
-            #     elapsed = time.time() - start_time
-            #     self.result.emit(text)
-            #     self.status.emit(f"Done in {elapsed:.2f}s")
-            #     self.log.emit(f"OCR completed in {elapsed:.2f}s", False)
-            #     self.log.emit(response.text, True)
-            # else:
-            #     error_msg = f"API error: {response.text}"
-            #     self.error.emit(error_msg)
-            #     self.log.emit(error_msg, True)
+            fallback = None
+            for tier, model in enumerate(tiers):
+                if tier:
+                    self.signals.restart.emit()
+                    self.signals.status.emit(f"Escalating to tier {tier + 1}")
+                    LOGGER.info(f"Escalating to {model}")
+                LOGGER.info(f"Sending to {model}")
+                
+                provider, url, headers, data = self._build_request(model, encoded_image)
+                response, text, truncated = self._post(provider, url, data, headers)
+                # A cut-off answer would be cut off again at the same
+                # MAX_TOKENS on a larger model, so it never escalates
+                if response.status_code != 200 or truncated or not _needs_escalation(text):
+                    break
+                fallback = text
             
-            # Groq Llama Vision API request block:
-
-            DEMO_KEY = os.getenv("GROQ_DEMO_KEY")
+            if response.status_code == 200 and truncated:
+                # Missing text; show what arrived but don't cache it
+                elapsed = time.time() - start_time
+                self.signals.result.emit(text)
+                self.signals.status.emit(f"Done in {elapsed:.2f}s (truncated)")
+                LOGGER.error(f"OCR output hit the {MAX_TOKENS}-token limit")
+            elif response.status_code == 200:
+                CACHE.set(cache_key, text)
+                elapsed = time.time() - start_time
+                self.signals.result.emit(text)
+                self.signals.status.emit(f"Done in {elapsed:.2f}s")
+                LOGGER.info(f"OCR completed in {elapsed:.2f}s")
+            elif fallback:
+                # The larger model failed; the smaller one's answer beats an
+                # error, but isn't cached so a re-run tries to escalate again
+                elapsed = time.time() - start_time
+                LOGGER.error(f"API error ({provider}): {response.text}")
+                self.signals.result.emit(fallback)
+                self.signals.status.emit(f"Done in {elapsed:.2f}s (escalation failed)")
+            else:
+                error_msg = f"API error ({provider}): {response.text}"
+                self.signals.error.emit(error_msg)
+                LOGGER.error(error_msg)
+        
+        except TaskCancelled:
+            LOGGER.info(f"OCR of {self.image_path} cancelled")
+        
+        except Exception as e:
+            error_msg = f"Processing error: {str(e)}"
+            self.signals.error.emit(error_msg)
+            LOGGER.error(error_msg)
+        
+        finally:
+            self.signals.finished.emit()
 
-            GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+    def _build_request(self, model, encoded_image):
+        if model in GROQ_MODELS:
+            # Groq Llama Vision API request
             headers = {
                 "Content-Type": "application/json",
-                "Authorization": f"Bearer {DEMO_KEY}"  # Replace dummy-api-key with your key
+                "Authorization": f"Bearer {os.getenv('GROQ_DEMO_KEY')}"
             }
-
             data = {
                 "messages": [
                     {
                         "role": "user",
                         "content": [
-                            {"type": "text", "text": f"{prompt}"},
+                            {"type": "text", "text": PROMPT},
                             {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{encoded_image}"}}
                         ]
                     }
                 ],
-                "model": "llama-3.2-11b-vision-preview",
-                "stream": False,
+                "model": model,
+                "max_tokens": MAX_TOKENS,
+                "temperature": 0,
+                "stream": True,
             }
+            return "Groq", GROQ_API_URL, headers, data
+        
+        # Local Ollama API request
+        headers = {"Content-Type": "application/json"}
+        data = {
+            "model": model,
+            "prompt": PROMPT,
+            "images": [encoded_image],
+            "options": {"num_predict": MAX_TOKENS, "temperature": 0},
+            "stream": True
+        }
+        return "Ollama", f"{self.url}/api/generate", headers, data
 
-            response = requests.post(
-                GROQ_API_URL,
-                json=data,
-                headers=headers,
-                timeout=120
-            )
-            if response.status_code == 200:
-                result = response.json()
-                text = result.get("choices")[0].get("message").get("content").strip()
-                elapsed = time.time() - start_time
-                self.result.emit(text)
-                self.status.emit(f"Done in {elapsed:.2f}s")
-                self.log.emit(f"OCR completed in {elapsed:.2f}s", False)
-                self.log.emit(response.text, True)
+    def _post(self, provider, url, data, headers):
+        """Send a streaming request, retrying transient failures.
+
+        Returns the response with the full text and whether it was cut off;
+        the text is None when the request failed.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            if provider == "Groq":
+                self._throttle()
+            self._check_running()
+            with CLIENT.stream(
+                "POST",
+                url,
+                content=orjson.dumps(data),
+                headers=headers
+            ) as response:
+                if response.status_code == 200:
+                    return response, *self._read_stream(provider, response)
+                response.read()
+            if attempt == MAX_RETRIES or not _is_transient(response):
+                break
+            wait = _retry_delay(response, attempt)
+            self.signals.status.emit(f"Rate limited, retry {attempt + 1}/{MAX_RETRIES} in {wait:g}s")
+            LOGGER.error(f"API returned {response.status_code}, retrying in {wait:g}s")
+            self._sleep(wait)
+        return response, None, False
+
+    def _throttle(self):
+        # Reserve the next send slot within GROQ_RPM, then wait for it
+        # without holding the lock so other tasks can queue up behind us
+        self._check_running()
+        with _RATE_LOCK:
+            send_at = time.monotonic()
+            if len(_RATE) == GROQ_RPM:
+                send_at = max(send_at, _RATE[0] + 60)
+            _RATE.append(send_at)
+        wait = send_at - time.monotonic()
+        if wait > 0:
+            self.signals.status.emit(f"Throttling to stay under {GROQ_RPM} RPM")
+            LOGGER.info(f"Throttling for {wait:.1f}s")
+            self._sleep(wait)
+
+    def _sleep(self, seconds):
+        # Returns early, by raising, when the task is stopped
+        if self._stopped.wait(seconds):
+            raise TaskCancelled()
+
+    def _check_running(self):
+        if self._stopped.is_set():
+            raise TaskCancelled()
+
+    def _read_stream(self, provider, response):
+        # Groq sends OpenAI-style SSE events, Ollama one JSON object per line
+        parts = []
+        truncated = False
+        for line in response.iter_lines():
+            self._check_running()
+            if provider == "Groq":
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                event = orjson.loads(line[6:])
+                _raise_stream_error(provider, event)
+                if not event.get("choices"):
+                    continue
+                choice = event["choices"][0]
+                delta = choice.get("delta", {}).get("content") or ""
+                if choice.get("finish_reason"):
+                    truncated = choice["finish_reason"] == "length"
             else:
-                error_msg = f"API error (Groq): {response.text}"
-                self.error.emit(error_msg)
-                self.log.emit(error_msg, True)
-        
-        except Exception as e:
-            error_msg = f"Processing error: {str(e)}"
-            self.error.emit(error_msg)
-            self.log.emit(error_msg, True)
-        
-        finally:
-            self.finished.emit()
+                if not line:
+                    continue
+                chunk = orjson.loads(line)
+                _raise_stream_error(provider, chunk)
+                delta = chunk.get("response", "")
+                if chunk.get("done"):
+                    truncated = chunk.get("done_reason") == "length"
+            if delta:
+                parts.append(delta)
+                self.signals.delta.emit(delta)
+        return "".join(parts).strip(), truncated
 
     def stop(self):
-        self._is_running = False
+        self._stopped.set()
 
 
 class OCRApp(QMainWindow):
@@ -135,9 +523,23 @@ class OCRApp(QMainWindow):
         # Variables
         self.image_path = ""
         self.ollama_url = "http://localhost:11434"
-        self.preferred_model = "gemma:2b"
         self.available_models = []
-        self.worker_thread = None
+        self.task = None
+        self.batch_tasks = []
+        self.batch_paths = []
+        self.batch_results = {}
+        self.batch_done = 0
+        self.probe_task = None
+        self._last_clip_hash = None
+        self._image_data = None
+        self._source_pixmap = None
+        self.pool = QThreadPool.globalInstance()
+        self.pool.setMaxThreadCount(4)
+        
+        # Rescale once the window stops resizing rather than on every tick
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.timeout.connect(self._do_rescale)
         
         # Setup UI
         self.init_ui()
@@ -194,7 +596,7 @@ class OCRApp(QMainWindow):
         model_selection = QHBoxLayout()
         # model_selection.addWidget(QLabel("Model:"))
         self.model_dropdown = QComboBox()
-        self.model_dropdown.addItem("Loading models...")
+        self.model_dropdown.addItems(GROQ_MODELS)
         self.model_dropdown.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         model_selection.addWidget(self.model_dropdown)
         control_layout.addLayout(model_selection)
@@ -227,11 +629,15 @@ class OCRApp(QMainWindow):
             event.acceptProposedAction()
     
     def dropEvent(self, event):
-        for url in event.mimeData().urls():
-            file_path = url.toLocalFile()
-            if file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif')):
-                self.load_image(file_path)
-                break
+        paths = [
+            url.toLocalFile() for url in event.mimeData().urls()
+            if url.toLocalFile().lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))
+        ]
+        if not paths:
+            return
+        self.load_image(paths[0])
+        if len(paths) > 1:
+            self._batch_ocr(paths)
     
     # Clipboard paste support
     def keyPressEvent(self, event):
@@ -241,7 +647,20 @@ class OCRApp(QMainWindow):
             
             if mime_data.hasImage():
                 qimage = clipboard.image()
+                if qimage.isNull():
+                    return
+                # Skip pasting the same screenshot again
+                pixels = qimage.constBits().asstring(qimage.sizeInBytes())
+                clip_hash = hashlib.blake2b(pixels, digest_size=16).digest()
+                if clip_hash == self._last_clip_hash:
+                    return
+                self._last_clip_hash = clip_hash
+                
+                self.image_path = "clipboard.png"
+                self._image_data = qimage
+                self.image_info.setText("Pasted image")
                 self.load_pixmap(QPixmap.fromImage(qimage))
+                self.update_status("Loaded: pasted image")
             elif mime_data.hasUrls():
                 for url in mime_data.urls():
                     file_path = url.toLocalFile()
@@ -250,11 +669,21 @@ class OCRApp(QMainWindow):
                         break
     
     def load_image(self, file_path):
+        try:
+            raw_bytes = Path(file_path).read_bytes()
+        except OSError as e:
+            self.update_status(f"Error: {str(e)}", error=True)
+            self.log(f"Could not read {file_path}: {str(e)}", error=True)
+            return
+        
         self.image_path = file_path
+        self._image_data = raw_bytes
+        self._last_clip_hash = None
         self.image_info.setText(file_path.split('/')[-1])
         
-        # Display image
-        pixmap = QPixmap(file_path)
+        # Display image from the same bytes the OCR task will use
+        pixmap = QPixmap()
+        pixmap.loadFromData(self._image_data)
         self.load_pixmap(pixmap)
         
         self.log(f"Loaded image: {file_path}")
@@ -262,60 +691,57 @@ class OCRApp(QMainWindow):
     
     def load_pixmap(self, pixmap):
         if not pixmap.isNull():
-            # Scale to fit while maintaining aspect ratio
-            scaled = pixmap.scaled(
+            self._source_pixmap = pixmap
+            self._do_rescale()
+    
+    def _do_rescale(self, transformation=Qt.TransformationMode.SmoothTransformation):
+        if self._source_pixmap is not None:
+            # Scale the original to fit while maintaining aspect ratio
+            scaled = self._source_pixmap.scaled(
                 self.image_label.width() - 20,
                 self.image_label.height() - 20,
                 Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
+                transformation
             )
             self.image_label.setPixmap(scaled)
             self.image_label.setText("")
     
     def check_ollama_connection(self):
+        # Show the last known models straight away, then refresh off the GUI thread
+        cached = _load_cached_models()
+        if cached is not None:
+            self._populate_models(cached)
+            self.log(f"Cached models: {', '.join(cached)}")
+        
         self.update_status("Connecting to Ollama...")
         self.log("Attempting to connect to Ollama...")
         
-        try:
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
-            
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                self.available_models = [model["name"] for model in models]
-                self.log(f"Available models: {', '.join(self.available_models)}")
-                
-                self.model_dropdown.clear()
-                if self.available_models:
-                    self.model_dropdown.addItems(self.available_models)
-                    if any(self.preferred_model in model for model in self.available_models):
-                        index = self.model_dropdown.findText(self.preferred_model)
-                        self.model_dropdown.setCurrentIndex(index)
-                
-                self.update_status(f"Connected | {len(self.available_models)} models")
-            else:
-                self.update_status("Connection failed", error=True)
-                self.log(f"Connection failed: {response.text}", error=True)
-        except Exception as e:
-            self.update_status(f"Error: {str(e)}", error=True)
-            self.log(f"Connection error: {str(e)}", error=True)
+        self.probe_task = ProbeTask(self.ollama_url)
+        self.probe_task.signals.models_ready.connect(self.models_loaded)
+        self.probe_task.signals.error.connect(self.probe_failed)
+        self.pool.start(self.probe_task)
     
-    def run_ocr(self):
-        if not self.image_path:
-            self.update_status("No image selected", error=True)
-            QMessageBox.warning(self, "Warning", "Please select an image first")
-            return
-        
-        if not self.model_dropdown.currentText() or self.model_dropdown.currentText() == "Loading models...":
-            self.update_status("No model selected", error=True)
-            QMessageBox.warning(self, "Warning", "Please select a model first")
-            return
-        
-        self.process_btn.setEnabled(False)
-        self.result_text.clear()
-        self.update_status("Processing...")
+    def models_loaded(self, models):
+        self.probe_task = None
+        self.log(f"Available models: {', '.join(models)}")
+        self._populate_models(models)
+        self.update_status(f"Connected | {len(models)} models")
+    
+    def probe_failed(self, message):
+        self.probe_task = None
+        self.update_status(f"Error: {message}", error=True)
+        self.log(f"Connection error: {message}", error=True)
+    
+    def _populate_models(self, models):
+        current = self.model_dropdown.currentText()
+        self.available_models = models
         
-        # Use QTimer to allow UI to update before starting OCR
-        QTimer.singleShot(100, self.perform_ocr)
+        self.model_dropdown.clear()
+        self.model_dropdown.addItems(GROQ_MODELS + self.available_models)
+        # Otherwise stay on the first Groq model: Ollama models are not
+        # necessarily vision models and would answer without the image
+        if current in GROQ_MODELS + self.available_models:
+            self.model_dropdown.setCurrentIndex(self.model_dropdown.findText(current))
     
     def select_image(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -339,25 +765,82 @@ class OCRApp(QMainWindow):
         self.process_btn.setEnabled(False)
         self.result_text.clear()
         
-        # Setup worker thread
-        self.worker_thread = QThread()
-        self.worker = OCRWorker(
+        # Setup task
+        self.task = OCRTask(
             self.image_path,
             self.model_dropdown.currentText(),
-            self.ollama_url
+            self.ollama_url,
+            self._image_data
         )
-        self.worker.moveToThread(self.worker_thread)
         
         # Connect signals
-        self.worker.result.connect(self.handle_result)
-        self.worker.error.connect(self.handle_error)
-        self.worker.status.connect(self.update_status)
-        self.worker.log.connect(self.log_message)
-        self.worker.finished.connect(self.cleanup_thread)
+        self.task.signals.result.connect(self.handle_result)
+        self.task.signals.delta.connect(self.handle_delta)
+        self.task.signals.restart.connect(self.result_text.clear)
+        self.task.signals.error.connect(self.handle_error)
+        self.task.signals.status.connect(self.update_status)
+        self.task.signals.finished.connect(self.task_finished)
+        
+        # Run on the shared pool
+        self.pool.start(self.task)
+    
+    def _batch_ocr(self, paths):
+        # Fan the images out over the pool; its thread cap bounds concurrency
+        if self.batch_tasks:
+            self.update_status("A batch is already running", error=True)
+            return
+        if self.task:
+            self.update_status("Wait for the current OCR to finish", error=True)
+            return
+        
+        if not self.model_dropdown.currentText():
+            self.update_status("No model selected", error=True)
+            QMessageBox.warning(self, "Warning", "Please select a model first")
+            return
+        
+        self.process_btn.setEnabled(False)
+        self.result_text.clear()
+        self.batch_paths = paths
+        self.batch_results = {}
+        self.batch_done = 0
+        self.batch_tasks = []
+        self.update_status(f"Batch: 0/{len(paths)} done")
         
-        # Start thread
-        self.worker_thread.started.connect(self.worker.run)
-        self.worker_thread.start()
+        for index, path in enumerate(paths):
+            task = OCRTask(path, self.model_dropdown.currentText(), self.ollama_url)
+            task.signals.result.connect(partial(self.handle_batch_result, index))
+            task.signals.error.connect(partial(self.handle_batch_error, index))
+            task.signals.status.connect(partial(self.handle_batch_status, index))
+            task.signals.finished.connect(self.batch_task_finished)
+            self.batch_tasks.append(task)
+            self.pool.start(task)
+    
+    def handle_batch_result(self, index, text):
+        self.batch_results[index] = text
+        sections = [
+            f"--- {os.path.basename(path)} ---\n{self.batch_results[i]}"
+            for i, path in enumerate(self.batch_paths) if i in self.batch_results
+        ]
+        self.result_text.setPlainText("\n\n".join(sections))
+    
+    def handle_batch_status(self, index, message):
+        name = os.path.basename(self.batch_paths[index])
+        self.update_status(f"Batch: {self.batch_done}/{len(self.batch_tasks)} done | {name}: {message}")
+    
+    def handle_batch_error(self, index, error_msg):
+        self.handle_batch_result(index, f"[{error_msg}]")
+    
+    def batch_task_finished(self):
+        self.batch_done += 1
+        self.update_status(f"Batch: {self.batch_done}/{len(self.batch_tasks)} done")
+        if self.batch_done == len(self.batch_tasks):
+            self.batch_tasks = []
+            self.process_btn.setEnabled(True)
+    
+    def handle_delta(self, delta):
+        # Append at the end even if the user has moved the cursor
+        self.result_text.moveCursor(QTextCursor.MoveOperation.End)
+        self.result_text.insertPlainText(delta)
     
     def handle_result(self, text):
         self.result_text.setPlainText(text)
@@ -366,35 +849,18 @@ class OCRApp(QMainWindow):
         QMessageBox.critical(self, "Error", error_msg)
         self.update_status("Error occurred", error=True)
     
-    def log_message(self, message, is_error):
-        timestamp = time.strftime("%H:%M:%S")
-        color = "\033[91m" if is_error else ""
-        reset = "\033[0m" if is_error else ""
-        print(f"{color}[{timestamp}] {message}{reset}")
-    
-    def cleanup_thread(self):
-        if self.worker_thread:
-            self.worker_thread.quit()
-            self.worker_thread.wait()
-            self.worker_thread = None
-        self.process_btn.setEnabled(True)
+    def task_finished(self):
+        self.task = None
+        if not self.batch_tasks:
+            self.process_btn.setEnabled(True)
     
     def closeEvent(self, event):
-        if self.worker_thread and self.worker_thread.isRunning():
-            self.worker.stop()
-            self.worker_thread.quit()
-            self.worker_thread.wait()
+        for task in [self.task, *self.batch_tasks]:
+            if task:
+                task.stop()
+        self.pool.clear()
         event.accept()
 
-
-    def call_in_main_thread(self, func, *args):
-        """Thread-safe way to update the GUI"""
-        self.status_bar.parent().metaObject().invokeMethod(
-            self.status_bar.parent(),
-            lambda: func(*args),
-            Qt.ConnectionType.QueuedConnection
-        )
-
     def update_status(self, message, error=False):
         self.status_bar.setText(message)
         if error:
@@ -403,18 +869,19 @@ class OCRApp(QMainWindow):
             self.status_bar.setStyleSheet("color: #666;")
     
     def log(self, message, error=False):
-        timestamp = time.strftime("%H:%M:%S")
-        log_msg = f"[{timestamp}] {message}"
         if error:
-            print(f"\033[91m{log_msg}\033[0m")  # Red for errors
+            LOGGER.error(message)
         else:
-            print(log_msg)
+            LOGGER.info(message)
     
     def resizeEvent(self, event):
-        # Resize image when window is resized
-        if hasattr(self.image_label, 'pixmap') and self.image_label.pixmap():
-            pixmap = self.image_label.pixmap()
-            self.load_pixmap(pixmap)
+        # Resize image when window is resized (restarts the debounce timer)
+        if self._source_pixmap is not None:
+            size = self._source_pixmap.size()
+            if size.width() * size.height() > PREVIEW_PIXELS:
+                # Cheap preview while dragging; the timer redoes it smoothly
+                self._do_rescale(Qt.TransformationMode.FastTransformation)
+            self._resize_timer.start(50)
         super().resizeEvent(event)
 
 if __name__ == "__main__":
@@ -422,5 +889,8 @@ if __name__ == "__main__":
     app.setStyle('Fusion')
     window = OCRApp()
     window.show()
-    sys.exit(app.exec())
+    LOG_LISTENER.start()
+    exit_code = app.exec()
+    LOG_LISTENER.stop()
+    sys.exit(exit_code)
     